@@ -1,70 +1,105 @@
-import requests
+import aiohttp
+import asyncio
+import gzip
+import itertools
 import json
 import os
 import signal
 import sys
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock, Event
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import Event
 from tqdm import tqdm
 from datetime import datetime
 
-# Global variables for graceful shutdown and thread safety
+try:
+    import orjson
+except ImportError:  # Optional, falls back to the standard json module
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Optional, files are then parsed whole
+    ijson = None
+
+# Global variables for graceful shutdown
 scraper_state = {
     "current_data": None,
     "checkpoint_file": None,
     "temp_file": None,
     "is_running": False,
     "shutdown_event": Event(),
+    "semaphore": None,
+    "kabupaten_semaphore": None,
+    "failed_kab": 0,
+    "failed_pro": 0,
+    "pending_checkpoint": [],
+    "last_checkpoint_time": 0.0,
 }
 
-# Thread safety locks
-data_lock = Lock()
-checkpoint_lock = Lock()
-progress_lock = Lock()
-
-# Threading configuration
+# Concurrency configuration
 MAX_WORKERS = 4  # Adjust based on API rate limits and system capacity
+REQUESTS_PER_WORKER = 8  # In-flight requests allowed per worker
+REQUEST_TIMEOUT = 10  # Seconds per API request
+KABUPATEN_TIMEOUT = 300  # Seconds to process a whole kabupaten
+PREFETCH_PROVINCES = 2  # Provinces whose list_kab is fetched ahead of time
 
+# Checkpoint configuration
+CHECKPOINT_COMPRESSLEVEL = 1  # Cheap gzip level, JSON keys still compress well
+CHECKPOINT_EVERY_KAB = 20  # Flush after this many completed kabupaten
+CHECKPOINT_INTERVAL = 10  # Or after this many seconds, whichever comes first
+MAX_RETRIES = 3  # Retries for connection errors and retryable statuses
+RETRY_BACKOFF = 0.3  # Seconds, doubled after every failed attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-def signal_handler(signum, frame):
+
+def request_shutdown(task):
     """Handle Ctrl+C and other termination signals"""
-    if not scraper_state["is_running"]:
-        print("\n⚠️ Script sedang tidak berjalan, keluar...")
-        sys.exit(0)
+    if scraper_state["shutdown_event"].is_set():
+        return
 
-    print("\n🛑 Mendeteksi Ctrl+C, menghentikan threads dan menyimpan checkpoint...")
+    print("\n🛑 Mendeteksi Ctrl+C, menghentikan request dan menyimpan checkpoint...")
 
-    # Set shutdown event to stop all threads gracefully
+    # Set shutdown event to stop all pending tasks gracefully
     scraper_state["shutdown_event"].set()
 
-    try:
-        if scraper_state["current_data"] and scraper_state["checkpoint_file"]:
-            safe_checkpoint_save(
-                scraper_state["current_data"],
-                scraper_state["checkpoint_file"],
-                "Disimpan karena script dihentikan paksa",
-            )
+    # This runs on the event loop, so scrape_all sits at an await and never
+    # inside a checkpoint write. It saves everything once cancelled
+    task.cancel()
 
-        if scraper_state["current_data"] and scraper_state["temp_file"]:
-            save_to_file(scraper_state["current_data"], scraper_state["temp_file"])
 
-        print("💾 Checkpoint berhasil disimpan!")
-        print("🔄 Jalankan ulang script untuk melanjutkan dari posisi terakhir")
-
-    except Exception as e:
-        print(f"❌ Error saat menyimpan checkpoint: {e}")
+def add_shutdown_handlers(loop, task):
+    """Route Ctrl+C and termination signals to request_shutdown"""
+    signals = [signal.SIGINT]  # Ctrl+C
+    if hasattr(signal, "SIGTERM"):
+        signals.append(signal.SIGTERM)  # Termination signal
 
-    finally:
-        scraper_state["is_running"] = False
-        print("👋 Script dihentikan dengan aman")
-        sys.exit(0)
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, request_shutdown, task)
+        except NotImplementedError:
+            # Windows loops have no add_signal_handler, hop onto the loop
+            signal.signal(
+                sig,
+                lambda signum, frame: loop.call_soon_threadsafe(
+                    request_shutdown, task
+                ),
+            )
+    return signals
 
 
-# Setup signal handlers
-signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
-if hasattr(signal, "SIGTERM"):
-    signal.signal(signal.SIGTERM, signal_handler)  # Termination signal
+def remove_shutdown_handlers(loop, signals):
+    """Restore the default handling of signals set by add_shutdown_handlers"""
+    for sig in signals:
+        try:
+            loop.remove_signal_handler(sig)
+        except NotImplementedError:
+            signal.signal(
+                sig,
+                signal.default_int_handler if sig == signal.SIGINT else signal.SIG_DFL,
+            )
 
 
 BASE_URL = "https://sipedas.pertanian.go.id/api/wilayah/"
@@ -75,25 +110,61 @@ os.makedirs("output", exist_ok=True)
 os.makedirs("output/checkpoints", exist_ok=True)
 
 
-def get_json(endpoint, params=None):
-    try:
-        resp = requests.get(BASE_URL + endpoint, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-
-        # Clean the received data to handle encoding issues
-        if isinstance(data, dict):
-            cleaned_data = {}
-            for key, value in data.items():
-                if isinstance(value, str):
-                    cleaned_data[key] = normalize_text(value)
-                else:
-                    cleaned_data[key] = value
-            return cleaned_data
-        return data
-    except Exception as e:
-        print(f"Error fetching {endpoint} with {params}: {e}")
-        return {}
+def create_session():
+    """Create the keep-alive HTTP session shared by every request of a run"""
+    connector = aiohttp.TCPConnector(
+        limit=MAX_WORKERS * REQUESTS_PER_WORKER,
+        ttl_dns_cache=300,
+        keepalive_timeout=60,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        # Responses are decompressed transparently
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
+
+
+async def fetch_json(session, endpoint, params=None):
+    """Fetch an API endpoint, raising once every retry has failed"""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with scraper_state["semaphore"]:
+                async with session.get(BASE_URL + endpoint, params=params) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+            break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = getattr(e, "status", None)
+            if attempt == MAX_RETRIES or (
+                status is not None and status not in RETRY_STATUSES
+            ):
+                print(f"Error fetching {endpoint} with {params}: {e}")
+                raise
+            # Back off outside the semaphore so other requests keep flowing
+            await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+
+    # Clean the received data to handle encoding issues
+    if isinstance(data, dict):
+        cleaned_data = {}
+        for key, value in data.items():
+            if isinstance(value, str):
+                cleaned_data[key] = normalize_text(value)
+            else:
+                cleaned_data[key] = value
+        return cleaned_data
+    return data
+
+
+# Escaped quotes and other common encoding issues, applied in this order
+NORMALIZE_REPLACEMENTS = {
+    "\\'": "'",  # Escaped single quote
+    '\\"': '"',  # Escaped double quote
+    "\\\\": "\\",  # Double backslash
+    "\\/": "/",  # Escaped forward slash
+    "\\u0027": "'",  # Unicode single quote
+    "\\u0022": '"',  # Unicode double quote
+}
 
 
 def normalize_text(text):
@@ -101,124 +172,215 @@ def normalize_text(text):
     if not isinstance(text, str):
         return text
 
-    # Replace escaped quotes and other common encoding issues
-    replacements = {
-        "\\'": "'",  # Replace escaped single quotes
-        '\\"': '"',  # Replace escaped double quotes
-        "\\\\": "\\",  # Replace double backslashes
-        "\\/": "/",  # Replace escaped forward slashes
-    }
+    # Every replacement starts with a backslash, most names have none
+    if "\\" not in text:
+        return text
 
-    normalized = text
-    for old, new in replacements.items():
-        normalized = normalized.replace(old, new)
+    return replace_escapes(text)
 
-    # Additional normalization for common Indonesian characters
-    normalized = normalized.replace("\\u0027", "'")  # Unicode single quote
-    normalized = normalized.replace("\\u0022", '"')  # Unicode double quote
 
-    return normalized
+@lru_cache(maxsize=65536)
+def replace_escapes(text):
+    """Apply every replacement, cached for repeated names"""
+    # Chained on purpose: "\\\\/" first becomes "\\/" and then "/"
+    for old, new in NORMALIZE_REPLACEMENTS.items():
+        text = text.replace(old, new)
+    return text
 
 
 def clean_data_structure(data):
-    """Recursively clean all text fields in the data structure"""
-    if isinstance(data, dict):
-        cleaned = {}
-        for key, value in data.items():
-            if key == "nama" and isinstance(value, str):
-                cleaned[key] = normalize_text(value)
-            else:
-                cleaned[key] = clean_data_structure(value)
-        return cleaned
-    elif isinstance(data, list):
-        return [clean_data_structure(item) for item in data]
-    elif isinstance(data, str):
+    """Clean all text fields in the data structure in place"""
+    if isinstance(data, str):
         return normalize_text(data)
-    else:
-        return data
 
+    # Walk the tree with an explicit stack instead of recursion
+    stack = deque([data])
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            continue
 
-def save_to_file(data, filename):
-    # Clean the data before saving
-    cleaned_data = clean_data_structure(data)
-    with open(filename, "w", encoding="utf-8", errors="replace") as f:
-        json.dump(cleaned_data, f, ensure_ascii=False, indent=2, separators=(",", ": "))
+        for key, value in items:
+            if isinstance(value, str):
+                node[key] = normalize_text(value)
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
 
+    return data
 
-def load_checkpoint(checkpoint_file):
-    """Load checkpoint data if exists, otherwise return empty structure"""
-    if os.path.exists(checkpoint_file):
-        try:
-            with open(checkpoint_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                print(f"📂 Checkpoint ditemukan: {checkpoint_file}")
-                print(f"   - Provinsi yang sudah diproses: {len(data.get('pro', []))}")
-
-                # Clean the loaded data to fix any encoding issues
-                cleaned_data = clean_data_structure(data)
-                return cleaned_data
-        except Exception as e:
-            print(f"⚠️ Error loading checkpoint: {e}")
-    return {"pro": []}
 
+def dump_json(data, indent=False):
+    """Serialize data to UTF-8 JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        text = json.dumps(data, ensure_ascii=False, indent=2, separators=(",", ": "))
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8", errors="replace")
 
-def save_checkpoint(data, checkpoint_file, progress_info=""):
-    """Save checkpoint with progress information"""
-    try:
-        save_to_file(data, checkpoint_file)
-        if progress_info:
-            print(f"💾 Checkpoint disimpan: {progress_info}")
-    except Exception as e:
-        print(f"⚠️ Error saving checkpoint: {e}")
 
+def load_json(raw):
+    """Parse JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
-def get_processed_ids(data, level="pro"):
-    """Get list of already processed IDs at specified level"""
-    if level == "pro":
-        return [p["id"] for p in data.get("pro", [])]
-    return []
 
+@contextmanager
+def atomic_write(filename):
+    """Write to a temporary file and atomically publish it on success"""
+    # An interrupted write never leaves a truncated file behind
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        try:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            # Do not leave a half-written temporary file behind
+            f.close()
+            os.remove(tmp_filename)
+            raise
+    os.replace(tmp_filename, filename)
 
-def find_last_processed_position(data):
-    """Find the last processed position to resume from"""
-    provinces = data.get("pro", [])
-    if not provinces:
-        return None, None, None, None
 
-    last_pro = provinces[-1]
-    last_pro_id = last_pro["id"]
+def save_to_file(data, filename):
+    # Text is normalized on fetch, legacy files are cleaned by fix_existing_file
+    with atomic_write(filename) as f:
+        f.write(dump_json(data, indent=True))
+
+
+def save_provinces_to_file(provinces, filename):
+    """Write provinces one at a time, same layout as save_to_file on {"pro": [...]}"""
+    count = 0
+    with atomic_write(filename) as f:
+        f.write(b'{\n  "pro": [')
+        for prov in provinces:
+            lines = dump_json(prov, indent=True).split(b"\n")
+            f.write(b"," if count else b"")
+            f.write(b"\n" + b"\n".join(b"    " + line for line in lines))
+            count += 1
+        f.write(b"\n  ]\n}" if count else b"]\n}")
+
+
+def is_province_file(filename):
+    """Check that a JSON file's top level is exactly {"pro": [...]}"""
+    with open(filename, "rb") as f:
+        events = ijson.parse(f)
+        if next(events, (None, None))[:2] != ("", "start_map"):
+            return False
+
+        seen_pro = False
+        for prefix, event, value in events:
+            if prefix == "" and event == "map_key":
+                # Any other or repeated key would be dropped by streaming
+                if value != "pro" or seen_pro:
+                    return False
+                seen_pro = True
+            elif prefix == "pro" and event not in ("start_array", "end_array"):
+                # "pro" holds something other than a list
+                return False
+    return seen_pro
+
+
+def read_checkpoint_records(checkpoint_file, repair=False):
+    """Stream completed kabupaten records from a gzip checkpoint log"""
+    valid_lines = 0
+    partial = False
+    with gzip.open(checkpoint_file, "rb") as f:
+        try:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    partial = True
+                    break
+                valid_lines += 1
+                yield load_json(line)
+        except (EOFError, gzip.BadGzipFile):
+            partial = True
+
+    if partial:
+        # A crash mid-append leaves a truncated gzip member at the end
+        print("⚠️ Baris terakhir checkpoint tidak lengkap, dilewati")
+
+        if repair:
+            # Rewrite the valid records so new appends do not follow a
+            # broken member, which would make them unreadable
+            with atomic_write(checkpoint_file) as out:
+                with gzip.open(checkpoint_file, "rb") as src, gzip.GzipFile(
+                    fileobj=out, mode="wb", compresslevel=CHECKPOINT_COMPRESSLEVEL
+                ) as dst:
+                    for line in itertools.islice(src, valid_lines):
+                        dst.write(line)
 
-    kabupaten_list = last_pro.get("kab", [])
-    if not kabupaten_list:
-        return last_pro_id, None, None, None
 
-    last_kab = kabupaten_list[-1]
-    last_kab_id = last_kab["id"]
+def load_checkpoint(checkpoint_file):
+    """Rebuild checkpoint data if exists, otherwise return empty structure"""
+    data = {"pro": []}
+    if os.path.exists(checkpoint_file):
+        data_index = build_data_index(data)
+        try:
+            for record in read_checkpoint_records(checkpoint_file, True):
+                prov = {
+                    "id": record["pro"],
+                    "nama": record["nama"],
+                    "kab": [record["kab"]],
+                }
+                update_global_data_safely(data, data_index, prov)
+            print(f"📂 Checkpoint ditemukan: {checkpoint_file}")
+            print(f"   - Provinsi yang sudah diproses: {len(data['pro'])}")
+        except Exception as e:
+            print(f"⚠️ Error loading checkpoint: {e}")
+    return data
+
 
-    kecamatan_list = last_kab.get("kec", [])
-    if not kecamatan_list:
-        return last_pro_id, last_kab_id, None, None
+def append_checkpoint(checkpoint_file, records):
+    """Append completed kabupaten records to the checkpoint log"""
+    # Every append adds a complete gzip member, readers see one stream
+    with gzip.open(checkpoint_file, "ab", CHECKPOINT_COMPRESSLEVEL) as f:
+        f.write(b"".join(dump_json(record) + b"\n" for record in records))
 
-    last_kec = kecamatan_list[-1]
-    last_kec_id = last_kec["id"]
 
-    return last_pro_id, last_kab_id, last_kec_id, len(last_kec.get("des", []))
+def build_data_index(data):
+    """Index provinces and their kabupaten by ID for constant-time lookups"""
+    prov_index = {}
+    kab_index = {}
+    for prov in data.get("pro", []):
+        prov_index[prov["id"]] = prov
+        kab_index[prov["id"]] = {k["id"]: k for k in prov.get("kab", [])}
+    return prov_index, kab_index
 
 
-def scrape_all():
+async def scrape_all():
     global scraper_state
 
+    # Signals only cancel this task, the checkpoint is written here
+    loop = asyncio.get_running_loop()
+    shutdown_signals = add_shutdown_handlers(loop, asyncio.current_task())
+
     try:
         # Set running flag and reset shutdown event
         scraper_state["is_running"] = True
         scraper_state["shutdown_event"].clear()
+        scraper_state["semaphore"] = asyncio.Semaphore(
+            MAX_WORKERS * REQUESTS_PER_WORKER
+        )
+        scraper_state["kabupaten_semaphore"] = asyncio.Semaphore(MAX_WORKERS)
+        scraper_state["failed_kab"] = 0
+        scraper_state["failed_pro"] = 0
+        scraper_state["pending_checkpoint"] = []
+        scraper_state["last_checkpoint_time"] = time.monotonic()
 
         # Get current date in YYYYMMDD format
         date_str = datetime.now().strftime("%Y%m%d")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         # File paths
-        checkpoint_file = f"output/checkpoints/checkpoint_{date_str}.json"
+        checkpoint_file = f"output/checkpoints/checkpoint_{date_str}.ndjson.gz"
         temp_file = f"output/temp_wilayah_{timestamp}.json"
         final_file = f"output/wilayah_final_{date_str}.json"
 
@@ -229,171 +391,159 @@ def scrape_all():
         # Load checkpoint if exists
         all_data = load_checkpoint(checkpoint_file)
         scraper_state["current_data"] = all_data  # Store in global state
+        data_index = build_data_index(all_data)
+        prov_index, kab_index = data_index
 
-        processed_pro_ids = get_processed_ids(all_data, "pro")
-
-        # Find resume position
-        resume_pro_id, resume_kab_id, resume_kec_id, resume_des_count = (
-            find_last_processed_position(all_data)
-        )
-
-        if resume_pro_id:
-            print(f"🔄 Melanjutkan dari provinsi: {resume_pro_id}")
-            if resume_kab_id:
-                print(f"   - Kabupaten: {resume_kab_id}")
-            if resume_kec_id:
-                print(f"   - Kecamatan: {resume_kec_id}")
-                print(f"   - Desa sudah diproses: {resume_des_count}")
+        # Kabupaten already in the checkpoint are skipped as their province comes up
+        processed_kab = sum(len(kab_ids) for kab_ids in kab_index.values())
+        if processed_kab:
+            print(f"🔄 Melanjutkan, {processed_kab} kabupaten di checkpoint dilewati")
 
         print("📌 Mengambil data provinsi...")
         print("💡 Tekan Ctrl+C untuk menghentikan dan menyimpan checkpoint")
-        print(f"🧵 Menggunakan {MAX_WORKERS} thread untuk parallel processing")
-
-        provinsi_dict = get_json("list_pro", {"thn": THN})
-        provinsi_items = list(provinsi_dict.items())
-
-        # Filter out already processed provinces if resuming
-        if resume_pro_id:
-            # Find starting position
-            start_index = 0
-            for i, (pro_id, _) in enumerate(provinsi_items):
-                if pro_id == resume_pro_id:
-                    start_index = i
-                    break
-            provinsi_items = provinsi_items[start_index:]
-        else:
-            # Remove completely processed provinces
-            provinsi_items = [
-                (pid, pname)
-                for pid, pname in provinsi_items
-                if pid not in processed_pro_ids
-            ]
-
-        # Process provinces sequentially but kabupaten in parallel
-        for i_pro, (pro_id, pro_name) in enumerate(
-            tqdm(provinsi_items, desc="Provinsi", unit="provinsi")
-        ):
-            if scraper_state["shutdown_event"].is_set():
-                break
-
-            # Update global state periodically
-            with data_lock:
-                scraper_state["current_data"] = all_data
+        print(
+            f"⚡ Menggunakan maksimal {MAX_WORKERS * REQUESTS_PER_WORKER} request bersamaan"
+        )
 
-            # Find existing province data or create new
-            existing_prov = None
-            with data_lock:
-                for prov in all_data["pro"]:
-                    if prov["id"] == pro_id:
-                        existing_prov = prov
-                        break
+        async with create_session() as session:
+            try:
+                provinsi_dict = await fetch_json(session, "list_pro", {"thn": THN})
+                provinsi_items = list(provinsi_dict.items())
+            except Exception as e:
+                print(f"❌ Gagal mengambil daftar provinsi: {e}")
+                print("🔄 Jalankan ulang script untuk mencoba lagi")
+                return
 
-            if existing_prov:
-                prov = existing_prov
-            else:
-                prov = {"id": pro_id, "nama": pro_name, "kab": []}
+            # Every province is visited again when resuming, so kabupaten that
+            # failed in an earlier province are retried. Finished kabupaten
+            # are filtered out per province below
 
-            print(
-                f"  ▶️ [{i_pro+1}/{len(provinsi_items)}] Mengambil kabupaten di provinsi '{pro_name}'..."
-            )
-            kabupaten_dict = get_json("list_kab", {"thn": THN, "pro": pro_id})
-            kabupaten_items = list(kabupaten_dict.items())
-
-            # Filter kabupaten if resuming
-            processed_kab_ids = [k["id"] for k in prov.get("kab", [])]
-            if resume_pro_id == pro_id and resume_kab_id:
-                # Find starting position for kabupaten
-                start_index = 0
-                for i, (kab_id, _) in enumerate(kabupaten_items):
-                    if kab_id == resume_kab_id:
-                        start_index = i
+            # Process provinces sequentially but kabupaten concurrently
+            kab_prefetch = {}
+            try:
+                for i_pro, (pro_id, pro_name) in enumerate(
+                    tqdm(provinsi_items, desc="Provinsi", unit="provinsi")
+                ):
+                    if scraper_state["shutdown_event"].is_set():
                         break
-                kabupaten_items = kabupaten_items[start_index:]
-            else:
-                # Remove completely processed kabupaten
-                kabupaten_items = [
-                    (kid, kname)
-                    for kid, kname in kabupaten_items
-                    if kid not in processed_kab_ids
-                ]
-
-            if not kabupaten_items:
-                continue
 
-            # Process kabupaten in parallel batches
-            batch_size = min(MAX_WORKERS, len(kabupaten_items))
+                    # Update global state periodically
+                    scraper_state["current_data"] = all_data
 
-            with ThreadPoolExecutor(max_workers=batch_size) as executor:
-                futures = []
+                    # Kabupaten completed in this province only
+                    completed_kab = []
 
-                for j, kab_data in enumerate(kabupaten_items):
-                    if scraper_state["shutdown_event"].is_set():
-                        break
-
-                    # Handle resume for first kabupaten
-                    resume_info = None
-                    if (
-                        j == 0
-                        and resume_pro_id == pro_id
-                        and resume_kab_id == kab_data[0]
-                    ):
-                        resume_info = (resume_kec_id, resume_des_count)
-
-                    future = executor.submit(
-                        process_kabupaten_parallel,
-                        kab_data,
-                        (pro_id, pro_name),
-                        resume_info,
+                    print(
+                        f"  ▶️ [{i_pro+1}/{len(provinsi_items)}] Mengambil kabupaten di provinsi '{pro_name}'..."
                     )
-                    futures.append((future, kab_data))
 
-                # Collect results and update data
-                completed_kab = []
-                for future, kab_data in futures:
-                    if scraper_state["shutdown_event"].is_set():
-                        break
+                    # Fetch list_kab of the next provinces while this one runs
+                    for next_pro_id, _ in provinsi_items[
+                        i_pro : i_pro + PREFETCH_PROVINCES + 1
+                    ]:
+                        if next_pro_id not in kab_prefetch:
+                            kab_prefetch[next_pro_id] = asyncio.ensure_future(
+                                fetch_json(
+                                    session,
+                                    "list_kab",
+                                    {"thn": THN, "pro": next_pro_id},
+                                )
+                            )
+
+                    try:
+                        kabupaten_dict = await kab_prefetch.pop(pro_id)
+                        kabupaten_items = list(kabupaten_dict.items())
+                    except Exception as e:
+                        print(
+                            f"❌ Gagal mengambil kabupaten di provinsi '{pro_name}': {e}"
+                        )
+                        scraper_state["failed_pro"] += 1
+                        continue
+
+                    # Remove completely processed kabupaten. Kabupaten finish out
+                    # of order, so the last checkpointed one is not a position
+                    processed_kab_ids = kab_index.get(pro_id, {})
+                    kabupaten_items = [
+                        (kid, kname)
+                        for kid, kname in kabupaten_items
+                        if kid not in processed_kab_ids
+                    ]
+
+                    if not kabupaten_items:
+                        continue
+
+                    # Schedule every kabupaten at once, the semaphore limits requests
+                    tasks = [
+                        asyncio.ensure_future(
+                            process_kabupaten_with_timeout(
+                                session, kab_data, (pro_id, pro_name)
+                            )
+                        )
+                        for kab_data in kabupaten_items
+                    ]
 
+                    # Checkpoint each kabupaten as soon as it finishes
                     try:
-                        result = future.result(
-                            timeout=300
-                        )  # 5 minute timeout per kabupaten
-                        if result:
+                        for next_done in asyncio.as_completed(tasks):
+                            if scraper_state["shutdown_event"].is_set():
+                                break
+
+                            result = await next_done
+                            if not result:
+                                continue
+
                             completed_kab.append(result)
 
-                            # Save checkpoint after each kabupaten completion
+                            # Queue the kabupaten for the next periodic checkpoint
                             temp_prov = {
                                 "id": pro_id,
                                 "nama": pro_name,
-                                "kab": completed_kab,
+                                "kab": [result],
                             }
-                            update_global_data_safely(all_data, temp_prov)
+                            update_global_data_safely(all_data, data_index, temp_prov)
 
-                            safe_checkpoint_save(
-                                all_data,
-                                checkpoint_file,
-                                f"Kabupaten {result['nama']} selesai",
+                            scraper_state["pending_checkpoint"].append(
+                                {"pro": pro_id, "nama": pro_name, "kab": result}
                             )
-                            save_to_file(all_data, temp_file)
-
-                    except Exception as e:
-                        print(f"❌ Error processing kabupaten {kab_data[1]}: {e}")
-
-            # Final province update
-            if completed_kab:
-                final_prov = {"id": pro_id, "nama": pro_name, "kab": completed_kab}
-                update_global_data_safely(all_data, final_prov)
-
-                safe_checkpoint_save(
-                    all_data, checkpoint_file, f"Provinsi {pro_name} selesai"
-                )
-                save_to_file(all_data, temp_file)
+                            print(f"✅ Kabupaten {result['nama']} selesai")
+                            safe_checkpoint_save()
+                    finally:
+                        # Stop kabupaten still in flight after a shutdown
+                        for task in tasks:
+                            task.cancel()
+
+                    # Every kabupaten is already merged, only flush the checkpoint
+                    if completed_kab:
+                        print(f"✅ Provinsi {pro_name} selesai")
+                        safe_checkpoint_save(force=True)
+            finally:
+                # Drop prefetches left over after a shutdown
+                for task in kab_prefetch.values():
+                    if not task.cancel() and not task.cancelled():
+                        task.exception()  # Already failed, mark it as retrieved
 
         # Save final result
-        if not scraper_state["shutdown_event"].is_set():
+        finished = not scraper_state["shutdown_event"].is_set()
+        failed_pro = scraper_state["failed_pro"]
+        failed_kab = scraper_state["failed_kab"]
+        if finished and (failed_pro or failed_kab):
+            # The checkpoint is kept so a rerun only retries what failed
+            if failed_pro:
+                print(f"⚠️ {failed_pro} provinsi gagal mengambil daftar kabupaten")
+            if failed_kab:
+                print(f"⚠️ {failed_kab} kabupaten gagal diproses")
+            print(f"   📁 File checkpoint: {checkpoint_file}")
+            print("🔄 Jalankan ulang script untuk mencoba lagi yang gagal")
+        elif finished:
+            # Provinces and kabupaten are checkpointed in completion order,
+            # a resume can even append a whole province last. Restore ID order
+            all_data["pro"].sort(key=lambda prov: prov["id"])
+            for prov in all_data["pro"]:
+                prov["kab"].sort(key=lambda kab: kab["id"])
+
             save_to_file(all_data, final_file)
             print(f"✅ Selesai!")
             print(f"   📁 File checkpoint: {checkpoint_file}")
-            print(f"   📁 File temp: {temp_file}")
             print(f"   📁 File final: {final_file}")
 
             # Optionally remove checkpoint after successful completion
@@ -404,17 +554,42 @@ def scrape_all():
             except Exception as e:
                 print(f"   ⚠️ Tidak bisa menghapus checkpoint: {e}")
 
-    except KeyboardInterrupt:
-        # This should be handled by signal handler, but just in case
-        print("\n🛑 Scraping dihentikan oleh pengguna")
+    except asyncio.CancelledError:
+        if not scraper_state["shutdown_event"].is_set():
+            raise
+
+        # Cancelled by request_shutdown, nothing else is writing right now
+        try:
+            # Flush kabupaten still waiting for the next periodic checkpoint
+            safe_checkpoint_save(force=True)
+
+            # One-off snapshot of everything scraped so far
+            if scraper_state["current_data"] and scraper_state["temp_file"]:
+                save_to_file(scraper_state["current_data"], scraper_state["temp_file"])
+
+            print("💾 Checkpoint berhasil disimpan!")
+            print("🔄 Jalankan ulang script untuk melanjutkan")
+
+        except Exception as e:
+            print(f"❌ Error saat menyimpan checkpoint: {e}")
+
+        print("👋 Script dihentikan dengan aman")
 
     finally:
+        remove_shutdown_handlers(loop, shutdown_signals)
+
+        # Keep finished kabupaten however the run ended
+        safe_checkpoint_save(force=True)
+
         # Reset running state
         scraper_state["is_running"] = False
         scraper_state["shutdown_event"].set()
         scraper_state["current_data"] = None
         scraper_state["checkpoint_file"] = None
         scraper_state["temp_file"] = None
+        scraper_state["semaphore"] = None
+        scraper_state["kabupaten_semaphore"] = None
+        scraper_state["pending_checkpoint"] = []
 
 
 def show_checkpoint_info():
@@ -424,7 +599,9 @@ def show_checkpoint_info():
         print("📁 Tidak ada folder checkpoint")
         return
 
-    checkpoints = [f for f in os.listdir(checkpoint_dir) if f.endswith(".json")]
+    checkpoints = [
+        f for f in os.listdir(checkpoint_dir) if f.endswith(".ndjson.gz")
+    ]
     if not checkpoints:
         print("📁 Tidak ada checkpoint yang ditemukan")
         return
@@ -433,32 +610,32 @@ def show_checkpoint_info():
     for cp in sorted(checkpoints):
         checkpoint_path = os.path.join(checkpoint_dir, cp)
         try:
-            with open(checkpoint_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                provinces = data.get("pro", [])
-                total_kab = sum(len(p.get("kab", [])) for p in provinces)
-                total_kec = sum(
-                    len(k.get("kec", [])) for p in provinces for k in p.get("kab", [])
-                )
-                total_des = sum(
-                    len(kc.get("des", []))
-                    for p in provinces
-                    for k in p.get("kab", [])
-                    for kc in k.get("kec", [])
-                )
-
-                file_size = os.path.getsize(checkpoint_path) / 1024 / 1024  # MB
-                mod_time = datetime.fromtimestamp(os.path.getmtime(checkpoint_path))
-
-                print(f"   🗂️ {cp}")
-                print(f"      - Provinsi: {len(provinces)}")
-                print(f"      - Kabupaten: {total_kab}")
-                print(f"      - Kecamatan: {total_kec}")
-                print(f"      - Desa: {total_des}")
-                print(f"      - Ukuran: {file_size:.2f} MB")
-                print(
-                    f"      - Terakhir diupdate: {mod_time.strftime('%Y-%m-%d %H:%M:%S')}"
-                )
+            provinces = set()
+            kab_ids = set()
+            total_kec = 0
+            total_des = 0
+            for record in read_checkpoint_records(checkpoint_path):
+                kab = record["kab"]
+                if (record["pro"], kab["id"]) in kab_ids:
+                    continue
+                provinces.add(record["pro"])
+                kab_ids.add((record["pro"], kab["id"]))
+                total_kec += len(kab.get("kec", []))
+                total_des += sum(len(kc.get("des", [])) for kc in kab.get("kec", []))
+            total_kab = len(kab_ids)
+
+            file_size = os.path.getsize(checkpoint_path) / 1024 / 1024  # MB
+            mod_time = datetime.fromtimestamp(os.path.getmtime(checkpoint_path))
+
+            print(f"   🗂️ {cp}")
+            print(f"      - Provinsi: {len(provinces)}")
+            print(f"      - Kabupaten: {total_kab}")
+            print(f"      - Kecamatan: {total_kec}")
+            print(f"      - Desa: {total_des}")
+            print(f"      - Ukuran: {file_size:.2f} MB")
+            print(
+                f"      - Terakhir diupdate: {mod_time.strftime('%Y-%m-%d %H:%M:%S')}"
+            )
         except Exception as e:
             print(f"   ❌ {cp} - Error: {e}")
 
@@ -469,14 +646,12 @@ def clean_old_checkpoints(keep_days=7):
     if not os.path.exists(checkpoint_dir):
         return
 
-    import time
-
     current_time = time.time()
     days_in_seconds = keep_days * 24 * 60 * 60
 
     cleaned = 0
     for filename in os.listdir(checkpoint_dir):
-        if filename.endswith(".json"):
+        if filename.endswith((".json", ".ndjson", ".ndjson.gz")):
             file_path = os.path.join(checkpoint_dir, filename)
             file_age = current_time - os.path.getmtime(file_path)
 
@@ -510,19 +685,26 @@ def fix_existing_file(input_file, output_file=None):
     try:
         print(f"🔧 Memperbaiki encoding: {input_file}")
 
-        # Load data
-        with open(
-            backup_file if output_file == input_file else input_file,
-            "r",
-            encoding="utf-8",
-        ) as f:
-            data = json.load(f)
+        source_file = backup_file if output_file == input_file else input_file
 
-        # Clean data
-        cleaned_data = clean_data_structure(data)
+        # Stream wilayah files one province at a time when ijson is available,
+        # anything with more than the "pro" list is loaded whole
+        if ijson is not None and is_province_file(source_file):
+            with open(source_file, "rb") as f:
+                provinces = ijson.items(f, "pro.item", use_float=True)
+                save_provinces_to_file(
+                    (clean_data_structure(prov) for prov in provinces), output_file
+                )
+        else:
+            # Load data
+            with open(source_file, "rb") as f:
+                data = load_json(f.read())
 
-        # Save cleaned data
-        save_to_file(cleaned_data, output_file)
+            # Clean data
+            cleaned_data = clean_data_structure(data)
+
+            # Save cleaned data
+            save_to_file(cleaned_data, output_file)
 
         print(f"✅ File berhasil diperbaiki: {output_file}")
         return True
@@ -536,37 +718,43 @@ def fix_existing_file(input_file, output_file=None):
         return False
 
 
-def safe_checkpoint_save(data, checkpoint_file, progress_info=""):
-    """Thread-safe checkpoint saving"""
-    with checkpoint_lock:
-        try:
-            save_to_file(data, checkpoint_file)
-            if progress_info:
-                with progress_lock:
-                    print(f"💾 Checkpoint disimpan: {progress_info}")
-        except Exception as e:
-            with progress_lock:
-                print(f"⚠️ Error saving checkpoint: {e}")
+def safe_checkpoint_save(force=False):
+    """Flush queued kabupaten to the checkpoint log once a threshold is reached"""
+    pending = scraper_state["pending_checkpoint"]
+    elapsed = time.monotonic() - scraper_state["last_checkpoint_time"]
+    if not force and (
+        len(pending) < CHECKPOINT_EVERY_KAB and elapsed < CHECKPOINT_INTERVAL
+    ):
+        return
+
+    try:
+        if pending and scraper_state["checkpoint_file"]:
+            append_checkpoint(scraper_state["checkpoint_file"], pending)
+            print(f"💾 Checkpoint disimpan: {len(pending)} kabupaten")
+            pending.clear()
+    except Exception as e:
+        print(f"⚠️ Error saving checkpoint: {e}")
 
+    scraper_state["last_checkpoint_time"] = time.monotonic()
 
-def process_kecamatan(kec_data, prov_info, kab_info, resume_info=None):
-    """Process a single kecamatan in a thread"""
+
+async def process_kecamatan(session, kec_data, prov_info, kab_info):
+    """Process a single kecamatan"""
     if scraper_state["shutdown_event"].is_set():
         return None
 
     kec_id, kec_name = kec_data
     pro_id, pro_name = prov_info
     kab_id, kab_name = kab_info
-    resume_des_count = resume_info if resume_info else 0
 
     try:
-        with progress_lock:
-            print(f"      🧵 Thread memproses kecamatan: {kec_name}")
+        print(f"      ⚡ Memproses kecamatan: {kec_name}")
 
         kec = {"id": kec_id, "nama": kec_name, "des": []}
 
         # Get desa data
-        desa_dict = get_json(
+        desa_dict = await fetch_json(
+            session,
             "list_des",
             {"thn": THN, "pro": pro_id, "kab": kab_id, "kec": kec_id},
         )
@@ -576,47 +764,38 @@ def process_kecamatan(kec_data, prov_info, kab_info, resume_info=None):
 
         desa_items = list(desa_dict.items())
 
-        # Process desa with resume capability
-        start_des_index = resume_des_count if resume_des_count else 0
-
-        for i_des, (des_id, des_name) in enumerate(desa_items[start_des_index:]):
+        for i_des, (des_id, des_name) in enumerate(desa_items):
             if scraper_state["shutdown_event"].is_set():
                 break
 
-            actual_index = start_des_index + i_des
-            with progress_lock:
-                print(
-                    f"        🧵 [{actual_index+1}/{len(desa_items)}] Desa: {des_name}"
-                )
+            print(f"        ⚡ [{i_des+1}/{len(desa_items)}] Desa: {des_name}")
 
             kec["des"].append({"id": des_id, "nama": des_name})
 
         return kec
 
     except Exception as e:
-        with progress_lock:
-            print(f"❌ Error processing kecamatan {kec_name}: {e}")
-        return None
+        # The kabupaten must not be checkpointed without this kecamatan
+        print(f"❌ Error processing kecamatan {kec_name}: {e}")
+        raise
 
 
-def process_kabupaten_parallel(kab_data, prov_info, resume_info=None):
-    """Process kabupaten with parallel kecamatan processing"""
+async def process_kabupaten_parallel(session, kab_data, prov_info):
+    """Process kabupaten with concurrent kecamatan processing"""
     if scraper_state["shutdown_event"].is_set():
         return None
 
     kab_id, kab_name = kab_data
     pro_id, pro_name = prov_info
-    resume_kec_id, resume_des_count = resume_info if resume_info else (None, None)
 
     try:
-        with progress_lock:
-            print(f"    🧵 Thread memproses kabupaten: {kab_name}")
+        print(f"    ⚡ Memproses kabupaten: {kab_name}")
 
         kab = {"id": kab_id, "nama": kab_name, "kec": []}
 
         # Get kecamatan data
-        kecamatan_dict = get_json(
-            "list_kec", {"thn": THN, "pro": pro_id, "kab": kab_id}
+        kecamatan_dict = await fetch_json(
+            session, "list_kec", {"thn": THN, "pro": pro_id, "kab": kab_id}
         )
 
         if scraper_state["shutdown_event"].is_set():
@@ -624,83 +803,69 @@ def process_kabupaten_parallel(kab_data, prov_info, resume_info=None):
 
         kecamatan_items = list(kecamatan_dict.items())
 
-        # Filter kecamatan if resuming
-        if resume_kec_id:
-            start_index = 0
-            for i, (kec_id, _) in enumerate(kecamatan_items):
-                if kec_id == resume_kec_id:
-                    start_index = i
-                    break
-            kecamatan_items = kecamatan_items[start_index:]
-
-        # Process kecamatan in smaller batches to avoid overwhelming the API
-        batch_size = min(2, len(kecamatan_items))  # Smaller batch for API courtesy
-
-        for i in range(0, len(kecamatan_items), batch_size):
-            if scraper_state["shutdown_event"].is_set():
-                break
-
-            batch = kecamatan_items[i : i + batch_size]
+        # Schedule every kecamatan at once, the shared semaphore keeps the
+        # number of in-flight requests within limits
+        coros = [
+            process_kecamatan(session, kec_data, prov_info, (kab_id, kab_name))
+            for kec_data in kecamatan_items
+        ]
 
-            with ThreadPoolExecutor(max_workers=min(batch_size, 2)) as executor:
-                futures = []
+        # Collect results, gather keeps the API order. Every kecamatan is
+        # awaited before a failure is raised so none is left running
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
-                for j, kec_data in enumerate(batch):
-                    if scraper_state["shutdown_event"].is_set():
-                        break
-
-                    # Handle resume for first kecamatan in batch
-                    resume_des = None
-                    if i == 0 and j == 0 and resume_kec_id == kec_data[0]:
-                        resume_des = resume_des_count
-
-                    future = executor.submit(
-                        process_kecamatan,
-                        kec_data,
-                        prov_info,
-                        (kab_id, kab_name),
-                        resume_des,
-                    )
-                    futures.append(future)
-
-                # Collect results
-                for future in as_completed(futures):
-                    if scraper_state["shutdown_event"].is_set():
-                        break
-
-                    result = future.result()
-                    if result:
-                        kab["kec"].append(result)
+        if scraper_state["shutdown_event"].is_set():
+            return None
 
+        kab["kec"].extend(results)
         return kab
 
     except Exception as e:
-        with progress_lock:
-            print(f"❌ Error processing kabupaten {kab_name}: {e}")
+        print(f"❌ Error processing kabupaten {kab_name}: {e}")
+        scraper_state["failed_kab"] += 1
         return None
 
 
-def update_global_data_safely(all_data, prov):
-    """Thread-safe update of global data"""
-    with data_lock:
-        # Find existing province or add new one
-        existing_prov = None
-        for existing in all_data["pro"]:
-            if existing["id"] == prov["id"]:
-                existing_prov = existing
-                break
+async def process_kabupaten_with_timeout(session, kab_data, prov_info):
+    """Process kabupaten, giving up after KABUPATEN_TIMEOUT seconds"""
+    # At most MAX_WORKERS kabupaten run at once, the timeout only starts
+    # once this kabupaten holds a slot
+    async with scraper_state["kabupaten_semaphore"]:
+        try:
+            return await asyncio.wait_for(
+                process_kabupaten_parallel(session, kab_data, prov_info),
+                timeout=KABUPATEN_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            print(f"❌ Error processing kabupaten {kab_data[1]}: timeout")
+            scraper_state["failed_kab"] += 1
+            return None
 
-        if existing_prov:
-            # Merge kabupaten data
-            existing_kab_ids = {k["id"] for k in existing_prov.get("kab", [])}
-            for kab in prov["kab"]:
-                if kab["id"] not in existing_kab_ids:
-                    existing_prov["kab"].append(kab)
-        else:
-            all_data["pro"].append(prov)
 
-        # Update global state
-        scraper_state["current_data"] = all_data
+def update_global_data_safely(all_data, data_index, prov):
+    """Merge a province result into the global data and its index"""
+    prov_index, kab_index = data_index
+
+    # Find existing province or add new one
+    existing_prov = prov_index.get(prov["id"])
+    if existing_prov is None:
+        existing_prov = {"id": prov["id"], "nama": prov["nama"], "kab": []}
+        all_data["pro"].append(existing_prov)
+        prov_index[prov["id"]] = existing_prov
+        kab_index[prov["id"]] = {}
+
+    # Merge kabupaten data
+    existing_kab = kab_index[prov["id"]]
+    for kab in prov["kab"]:
+        if kab["id"] not in existing_kab:
+            existing_prov["kab"].append(kab)
+            existing_kab[kab["id"]] = kab
+
+    # Update global state
+    scraper_state["current_data"] = all_data
 
 
 def show_help():
@@ -713,7 +878,7 @@ def show_help():
     print("🚀 SCRAPING:")
     print("   python scrape.py                    - Mulai scraping (default)")
     print("   python scrape.py scrape             - Mulai/lanjutkan scraping")
-    print("   python scrape.py scrape [threads]   - Scraping dengan N threads (1-8)")
+    print("   python scrape.py scrape [workers]   - Scraping dengan N worker (1-8)")
     print()
     print("📊 MANAGEMENT:")
     print("   python scrape.py info               - Lihat info checkpoint")
@@ -726,7 +891,7 @@ def show_help():
     print("   python scrape.py -h                 - Tampilkan bantuan ini")
     print()
     print("📖 CONTOH PENGGUNAAN:")
-    print("   python scrape.py scrape 2           - Gunakan 2 threads")
+    print("   python scrape.py scrape 2           - Gunakan 2 worker")
     print("   python scrape.py clean 3            - Hapus checkpoint >3 hari")
     print("   python scrape.py fix data.json      - Perbaiki file data.json")
     print()
@@ -734,8 +899,8 @@ def show_help():
     print("   Ctrl+C                                           - Hentikan dengan checkpoint")
     print()
     print("📁 FILE OUTPUT:")
-    print("   output/checkpoints/checkpoint_YYYYMMDD.json     - Checkpoint harian")
-    print("   output/temp_wilayah_YYYYMMDD_HHMMSS.json        - File temporary")
+    print("   output/checkpoints/checkpoint_YYYYMMDD.ndjson.gz - Checkpoint harian")
+    print("   output/temp_wilayah_YYYYMMDD_HHMMSS.json        - Snapshot saat Ctrl+C")
     print("   output/wilayah_final_YYYYMMDD.json              - Hasil akhir")
     print()
     print("📚 Dokumentasi lengkap: DOKUMENTASI_SCRAPER.md")
@@ -743,7 +908,7 @@ def show_help():
 
 
 def set_max_workers(count):
-    """Set the maximum number of worker threads"""
+    """Set the worker count used to size the request concurrency"""
     global MAX_WORKERS
     MAX_WORKERS = count
 
@@ -766,19 +931,19 @@ if __name__ == "__main__":
                     sys.exit(1)
             clean_old_checkpoints(days)
         elif command == "scrape":
-            # Check for thread count parameter
+            # Check for worker count parameter
             if len(sys.argv) > 2:
                 try:
-                    thread_count = int(sys.argv[2])
-                    if thread_count < 1 or thread_count > 8:
-                        print("⚠️ Jumlah thread harus antara 1-8")
+                    worker_count = int(sys.argv[2])
+                    if worker_count < 1 or worker_count > 8:
+                        print("⚠️ Jumlah worker harus antara 1-8")
                         sys.exit(1)
-                    set_max_workers(thread_count)
-                    print(f"🧵 Menggunakan {thread_count} thread")
+                    set_max_workers(worker_count)
+                    print(f"⚡ Menggunakan {worker_count} worker")
                 except ValueError:
-                    print("⚠️ Jumlah thread harus berupa angka")
+                    print("⚠️ Jumlah worker harus berupa angka")
                     sys.exit(1)
-            scrape_all()
+            asyncio.run(scrape_all())
         elif command == "fix":
             if len(sys.argv) < 3:
                 print(
@@ -795,4 +960,4 @@ if __name__ == "__main__":
             print("❌ Perintah tidak dikenal. Gunakan 'help' untuk melihat perintah yang tersedia.")
             show_help()
     else:
-        scrape_all()
+        asyncio.run(scrape_all())